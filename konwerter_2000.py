@@ -1,6 +1,9 @@
+import json
 import os
 import re
+import threading
 import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import filedialog, messagebox
 
 # ============================================================
@@ -46,13 +49,6 @@ def parse_pipe_header(header_line: str):
         headers.append(normalize_header(header_line[s:e]))
     return pipes, headers
 
-def find_col(headers, synonyms):
-    syns = {normalize_header(x) for x in synonyms}
-    for idx, h in enumerate(headers, start=1):
-        if h in syns:
-            return idx
-    return 0
-
 def extract_fields_by_pipes(line: str, pipes):
     ncols = len(pipes) - 1
     vals = [""] * (ncols + 1)  # index 0 unused
@@ -84,21 +80,166 @@ def looks_like_data_row(line: str, pipes=None, lp_slice=None) -> bool:
             return False
     return True
 
-def build_input_index_map(headers):
-    return {
-        "lp":   find_col(headers, ["LP", "LP."]),
-        "naz":  find_col(headers, ["NAZWA", "NAZWISKO HODOWCY", "NAZWISKO", "NAZWISKO I IMI"]),
-        "s":    find_col(headers, ["S", "S."]),
-        "wkm":  find_col(headers, ["W/K/M", "W-K-M", "W K M", "WKM"]),
-        "t":    find_col(headers, ["T", "TYP"]),
-        "obr":  find_col(headers, ["NUMER OBR", "NUMER OBR.", "NR OBR", "OBRACZKA", "OBRĄCZKA"]),
-        "godz": find_col(headers, ["GODZINA", "PRZYL", "T PRZYL", "T PRZYL.", "PRZYL."]),
-        "mmin": find_col(headers, ["M/MIN", "M/MIN.", "PREDK", "PREDK.", "PREDKOSC", "PRĘDKOŚĆ"]),
-        "coef": find_col(headers, ["COEF", "COEF.", "COEFIC", "COEFIC."]),
-        "gmp":  find_col(headers, ["GMP", "PKT GMP", "PKT_GMP", "PKT"]),
-        "oddz": find_col(headers, ["ODDZ", "PKT ODDZ", "PKT_ODDZ", "PUNKTY"]),
-        "km":   find_col(headers, ["KM", "ODLEG", "ODLEG.", "ODLEGŁOŚĆ"]),
-    }
+# ============================================================
+# Profile mapowania kolumn (dialekty nagłówków różnych programów)
+# ============================================================
+
+INPUT_COLUMN_SYNONYMS = {
+    "lp":   ["LP", "LP."],
+    "naz":  ["NAZWA", "NAZWISKO HODOWCY", "NAZWISKO", "NAZWISKO I IMI"],
+    "s":    ["S", "S."],
+    "wkm":  ["W/K/M", "W-K-M", "W K M", "WKM"],
+    "t":    ["T", "TYP"],
+    "obr":  ["NUMER OBR", "NUMER OBR.", "NR OBR", "OBRACZKA", "OBRĄCZKA"],
+    "godz": ["GODZINA", "PRZYL", "T PRZYL", "T PRZYL.", "PRZYL."],
+    "mmin": ["M/MIN", "M/MIN.", "PREDK", "PREDK.", "PREDKOSC", "PRĘDKOŚĆ"],
+    "coef": ["COEF", "COEF.", "COEFIC", "COEFIC."],
+    "gmp":  ["GMP", "PKT GMP", "PKT_GMP", "PKT"],
+    "oddz": ["ODDZ", "PKT ODDZ", "PKT_ODDZ", "PUNKTY"],
+    "km":   ["KM", "ODLEG", "ODLEG.", "ODLEGŁOŚĆ"],
+}
+
+DEFAULT_PROFILE = "domyślny"
+PROFILES_FILENAME = "LKON_PROFILES.json"
+
+def compile_synonym_lookup(synonyms_by_key) -> dict:
+    """
+    {klucz: [synonimy]} -> {znormalizowany synonim: klucz}
+    Przy kolizji wygrywa pierwszy klucz.
+    """
+    lookup = {}
+    for key, syns in synonyms_by_key.items():
+        if isinstance(syns, str):
+            syns = [syns]
+        for syn in syns:
+            lookup.setdefault(normalize_header(syn), key)
+    return lookup
+
+_PROFILE_LOOKUPS = {DEFAULT_PROFILE: compile_synonym_lookup(INPUT_COLUMN_SYNONYMS)}
+_DIALECT_CACHE = {}              # sygnatura nagłówka -> InputDialect
+_user_profiles_loaded = False
+_DIALECT_LOCK = threading.RLock()  # profile + cache; wydruk zbiorczy wykrywa nagłówki z wielu wątków
+
+def _compile_profile(name, synonyms_by_key, extend_default: bool = True) -> dict:
+    if not isinstance(synonyms_by_key, dict):
+        raise ValueError(f"Profil '{name}': oczekiwany obiekt {{kolumna: [synonimy]}}.")
+    for key, syns in synonyms_by_key.items():
+        if key not in INPUT_COLUMN_SYNONYMS:
+            raise ValueError(f"Profil '{name}': nieznana kolumna '{key}'.")
+        if isinstance(syns, str):
+            continue
+        if not isinstance(syns, list) or not all(isinstance(x, str) for x in syns):
+            raise ValueError(f"Profil '{name}': synonimy kolumny '{key}' muszą być tekstem lub listą tekstów.")
+    lookup = dict(_PROFILE_LOOKUPS[DEFAULT_PROFILE]) if extend_default else {}
+    lookup.update(compile_synonym_lookup(synonyms_by_key))
+    return lookup
+
+def register_mapping_profile(name: str, synonyms_by_key: dict, extend_default: bool = True):
+    """
+    Dodaje profil mapowania kolumn, np. dla nagłówków innego programu:
+      register_mapping_profile("XYZ", {"naz": ["HODOWCA"], "km": ["DYSTANS"]})
+    Synonimy profilu mają pierwszeństwo przed domyślnymi, a przy wykrywaniu
+    profil użytkownika wybieramy tylko, gdy rozpozna więcej kolumn niż domyślny.
+    """
+    lookup = _compile_profile(name, synonyms_by_key, extend_default)
+    with _DIALECT_LOCK:
+        _PROFILE_LOOKUPS[name] = lookup
+        _DIALECT_CACHE.clear()
+
+def load_user_profiles(path: str = None):
+    """
+    Wczytuje profile użytkownika z LKON_PROFILES.json (obok programu):
+      {"NazwaProfilu": {"naz": ["HODOWCA"], "km": ["DYSTANS"]}, ...}
+    Brak pliku -> tylko profil domyślny. Błąd w pliku -> żaden profil
+    z pliku nie zostaje zarejestrowany.
+    """
+    global _user_profiles_loaded
+    if path is None:
+        path = os.path.join(app_dir(), PROFILES_FILENAME)
+    if not os.path.exists(path):
+        _user_profiles_loaded = True
+        return
+    try:
+        data = json.loads(open(path, "r", encoding="utf-8").read())
+    except Exception as e:
+        raise ValueError(f"{PROFILES_FILENAME}: nie da się odczytać profili ({e}).") from e
+    if not isinstance(data, dict):
+        raise ValueError(f"{PROFILES_FILENAME}: oczekiwany obiekt {{nazwa: {{kolumna: [synonimy]}}}}.")
+
+    compiled = {}
+    for name, synonyms_by_key in data.items():
+        try:
+            compiled[name] = _compile_profile(name, synonyms_by_key)
+        except ValueError as e:
+            raise ValueError(f"{PROFILES_FILENAME}: {e}") from e
+
+    with _DIALECT_LOCK:
+        _PROFILE_LOOKUPS.update(compiled)
+        _DIALECT_CACHE.clear()
+        _user_profiles_loaded = True
+
+def mapping_profiles() -> dict:
+    with _DIALECT_LOCK:
+        if not _user_profiles_loaded:
+            load_user_profiles()
+        return _PROFILE_LOOKUPS
+
+def resolve_index_map(headers, lookup) -> dict:
+    idxs = dict.fromkeys(INPUT_COLUMN_SYNONYMS, 0)
+    for idx, h in enumerate(headers, start=1):
+        key = lookup.get(h)
+        if key and not idxs[key]:
+            idxs[key] = idx
+    return idxs
+
+class InputDialect:
+    def __init__(self, profile, header_line, pipes, idxs):
+        self.profile = profile                       # nazwa dopasowanego profilu
+        self.header_line = header_line
+        self.pipes = pipes[:]                        # list[int]
+        self.idxs = dict(idxs)                       # klucz -> nr kolumny (0 = brak)
+        self.lp_slice = None
+        if self.idxs["lp"]:
+            self.lp_slice = (self.pipes[self.idxs["lp"] - 1] + 1, self.pipes[self.idxs["lp"]])
+
+def header_signature(header_line: str) -> tuple:
+    return tuple(normalize_header(x) for x in header_line.split("|")[1:-1])
+
+def detect_input_dialect(header_line: str) -> InputDialect:
+    """
+    Dopasowuje nagłówek wejścia do profilu (najwięcej rozpoznanych kolumn;
+    przy remisie wygrywa domyślny, potem wcześniejszy profil użytkownika).
+    Wynik trzymamy w cache po sygnaturze nagłówka, więc kolejne pliki
+    z tego samego programu pomijają wykrywanie.
+    """
+    with _DIALECT_LOCK:
+        return _detect_input_dialect_locked(header_line)
+
+def _detect_input_dialect_locked(header_line: str) -> InputDialect:
+    sig = header_signature(header_line)
+    hit = _DIALECT_CACHE.get(sig)
+    if hit is not None:
+        if hit.header_line == header_line:
+            return hit
+        # te same kolumny, inne szerokości -> tylko nowe pozycje '|'
+        pipes, _ = parse_pipe_header(header_line)
+        hit = InputDialect(hit.profile, header_line, pipes, hit.idxs)
+        _DIALECT_CACHE[sig] = hit
+        return hit
+
+    pipes, headers = parse_pipe_header(header_line)
+    profiles = mapping_profiles()
+    order = [DEFAULT_PROFILE] + [n for n in profiles if n != DEFAULT_PROFILE]
+    best = None
+    for name in order:
+        idxs = resolve_index_map(headers, profiles[name])
+        score = sum(1 for v in idxs.values() if v)
+        if best is None or score > best[0]:
+            best = (score, name, idxs)
+
+    dialect = InputDialect(best[1], header_line, pipes, best[2])
+    _DIALECT_CACHE[sig] = dialect
+    return dialect
 
 # ============================================================
 # TEMPLATE LKON: layout z linii "+....+"
@@ -113,7 +254,9 @@ class LkonLayout:
 
 def load_lkon_layout_from_template(template_path: str) -> LkonLayout:
     lines, _ = read_text_auto(template_path)
+    return lkon_layout_from_lines(lines)
 
+def lkon_layout_from_lines(lines) -> LkonLayout:
     header_idx = None
     for i, ln in enumerate(lines):
         if "Lp.- NAZWISKO HODOWCY" in ln:
@@ -475,17 +618,19 @@ def build_lkon_row_1to1(vals, idxs, layout: LkonLayout) -> str:
 # + z podmianą nagłówka metadanymi z inputu
 # ============================================================
 
-def build_output_only_first_table_with_meta(template_path: str, input_meta: dict,
-                                            new_rows: list[str]) -> bytes:
+class LkonPrintTemplate:
+    def __init__(self, head_lines, footer_line, layout):
+        self.head_lines = head_lines[:]              # list[str] do pierwszej linii danych
+        self.footer_line = footer_line               # dolna ramka +...+ albo None
+        self.layout = layout                         # LkonLayout
+
+def compile_lkon_print_template(template_path: str) -> LkonPrintTemplate:
     """
-    Zwraca bytes od początku szablonu do końca pierwszej tabeli:
-      - nagłówek (z uzupełnionymi danymi z inputu)
-      - tabela (nowe rekordy)
-      - dolna ramka tabeli (1 linia +...+)
-    Nic poniżej.
+    Czyta szablon LKON raz i wyznacza cięcie pierwszej tabeli, żeby przy
+    wielu lotach nie parsować go od nowa.
     """
     tpl_lines, _ = read_text_auto(template_path)
-    tpl_lines = apply_meta_to_template_lines(tpl_lines, input_meta)
+    layout = lkon_layout_from_lines(tpl_lines)
 
     # znajdź nagłówek tabeli i rekordy w szablonie żeby wyznaczyć cięcie
     header_idx = None
@@ -516,13 +661,21 @@ def build_output_only_first_table_with_meta(template_path: str, input_meta: dict
             footer_idx = i
             break
 
-    # buduj wynik jako tekst cp1250
-    out_lines = []
-    out_lines.extend(tpl_lines[:data_start])
+    footer_line = tpl_lines[footer_idx] if footer_idx is not None else None
+    return LkonPrintTemplate(tpl_lines[:data_start], footer_line, layout)
+
+def render_first_table_lines(tpl: LkonPrintTemplate, input_meta: dict, new_rows: list[str]) -> list[str]:
+    # metadane podmieniamy tylko w nagłówku - reszta szablonu i tak nie idzie na wydruk
+    out_lines = apply_meta_to_template_lines(tpl.head_lines, input_meta)
     out_lines.extend(new_rows)
-    if footer_idx is not None:
-        out_lines.append(tpl_lines[footer_idx])
+    if tpl.footer_line is not None:
+        out_lines.append(tpl.footer_line)
+    return out_lines
 
+def encode_print_lines(out_lines: list[str]) -> bytes:
+    """
+    Wydruk (nagłówek + tabela + dolna ramka) jako bytes cp1250 z CRLF.
+    """
     # UWAGA: w tej wersji świadomie nie zachowujemy surowych ESC bytes z oryginału
     # (bo podmieniamy nagłówek). W praktyce większość systemów importu tego nie potrzebuje,
     # a Ty i tak importujesz tekst. Jeśli jednak MUSISZ mieć ESC, daj znać – zrobię hybrydę.
@@ -533,7 +686,7 @@ def build_output_only_first_table_with_meta(template_path: str, input_meta: dict
 # Conversions
 # ============================================================
 
-def convert_A_simple(input_path: str) -> str:
+def convert_A_simple(input_path: str) -> tuple[str, str]:
     # Prosty output bez kodów, same rekordy 1:1 wg LKON_TEMPLATE.TXT
     tpl = os.path.join(app_dir(), "LKON_TEMPLATE.TXT")
     if not os.path.exists(tpl):
@@ -546,32 +699,26 @@ def convert_A_simple(input_path: str) -> str:
     if hidx is None:
         raise ValueError("Wejście: nie znaleziono nagłówka tabeli (|Lp.| + Nazwa).")
 
-    pipes, headers = parse_pipe_header(hline)
-    idxs = build_input_index_map(headers)
-
-    lp_slice = None
-    if idxs["lp"]:
-        s = pipes[idxs["lp"] - 1] + 1
-        e = pipes[idxs["lp"]]
-        lp_slice = (s, e)
+    dialect = detect_input_dialect(hline)
 
     out_lines = []
     for ln in lines[hidx + 1:]:
         if "KONIEC LISTY" in ln.upper():
             break
-        if not looks_like_data_row(ln, pipes, lp_slice):
+        if not looks_like_data_row(ln, dialect.pipes, dialect.lp_slice):
             continue
-        vals = extract_fields_by_pipes(ln, pipes)
-        out_lines.append(build_lkon_row_1to1(vals, idxs, layout))
+        vals = extract_fields_by_pipes(ln, dialect.pipes)
+        out_lines.append(build_lkon_row_1to1(vals, dialect.idxs, layout))
 
     base, _ = os.path.splitext(input_path)
     out_path = base + "_LKON.txt"
     write_text(out_path, out_lines, encoding=enc)
-    return out_path
-
-def convert_B_printer_1to1_only_first_table_with_meta(input_path: str, template_path: str) -> str:
-    layout = load_lkon_layout_from_template(template_path)
+    return out_path, dialect.profile
 
+def parse_flight_for_print(input_path: str, layout: LkonLayout):
+    """
+    Jeden lot do trybu B: (metadane, wiersze LKON, dialekt nagłówka).
+    """
     in_lines, _ = read_text_auto(input_path)
     meta = parse_flight_meta_from_input(in_lines)
 
@@ -579,33 +726,75 @@ def convert_B_printer_1to1_only_first_table_with_meta(input_path: str, template_
     if hidx is None:
         raise ValueError("Wejście: nie znaleziono nagłówka tabeli (|Lp.| + Nazwa).")
 
-    pipes, headers = parse_pipe_header(hline)
-    idxs = build_input_index_map(headers)
-
-    lp_slice = None
-    if idxs["lp"]:
-        s = pipes[idxs["lp"] - 1] + 1
-        e = pipes[idxs["lp"]]
-        lp_slice = (s, e)
+    dialect = detect_input_dialect(hline)
 
     new_rows = []
     for ln in in_lines[hidx + 1:]:
         if "KONIEC LISTY" in ln.upper():
             break
-        if not looks_like_data_row(ln, pipes, lp_slice):
+        if not looks_like_data_row(ln, dialect.pipes, dialect.lp_slice):
             continue
-        vals = extract_fields_by_pipes(ln, pipes)
-        new_rows.append(build_lkon_row_1to1(vals, idxs, layout))
+        vals = extract_fields_by_pipes(ln, dialect.pipes)
+        new_rows.append(build_lkon_row_1to1(vals, dialect.idxs, layout))
 
     if not new_rows:
         raise ValueError("Wejście: nie znaleziono żadnych wierszy danych do konwersji.")
 
-    out_bytes = build_output_only_first_table_with_meta(template_path, meta, new_rows)
+    return meta, new_rows, dialect
+
+def convert_B_printer_1to1_only_first_table_with_meta(input_path: str, template_path: str) -> tuple[str, str]:
+    tpl = compile_lkon_print_template(template_path)
+    meta, new_rows, dialect = parse_flight_for_print(input_path, tpl.layout)
+
+    out_bytes = encode_print_lines(render_first_table_lines(tpl, meta, new_rows))
 
     base, _ = os.path.splitext(input_path)
     out_path = base + "_LKON_DRUK.txt"
     open(out_path, "wb").write(out_bytes)
-    return out_path
+    return out_path, dialect.profile
+
+def convert_B_batch_print(input_paths: list[str], template_path: str, out_path: str = None) -> tuple[str, list[str]]:
+    """
+    Zbiorczy wydruk wielu lotów (np. książka sezonu) w jednym pliku:
+      - szablon wczytany raz
+      - loty parsowane równolegle, kolejność jak w input_paths
+      - między lotami znak wysunięcia strony (form feed)
+    """
+    if not input_paths:
+        raise ValueError("Wydruk zbiorczy: nie wybrano żadnych plików wejściowych.")
+
+    tpl = compile_lkon_print_template(template_path)
+
+    if out_path is None:
+        base, _ = os.path.splitext(input_paths[0])
+        out_path = base + "_LKON_DRUK_ZBIORCZY.txt"
+
+    def _parse(path):
+        try:
+            return parse_flight_for_print(path, tpl.layout)
+        except ValueError as e:
+            raise ValueError(f"{os.path.basename(path)}: {e}") from e
+
+    profiles = []
+    workers = min(len(input_paths), os.cpu_count() or 1)
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        with open(out_path, "wb") as f:
+            # map() oddaje wyniki w kolejności wejścia, więc zapisujemy na bieżąco
+            for n, (meta, new_rows, dialect) in enumerate(pool.map(_parse, input_paths)):
+                if n:
+                    f.write(b"\f")
+                f.write(encode_print_lines(render_first_table_lines(tpl, meta, new_rows)))
+                profiles.append(dialect.profile)
+    except Exception:
+        # nie czekaj na parsowanie pozostałych lotów
+        pool.shutdown(wait=False, cancel_futures=True)
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        raise
+    pool.shutdown()
+
+    return out_path, profiles
 
 # ============================================================
 # GUI
@@ -631,8 +820,8 @@ def run_A():
     if not p:
         return
     try:
-        outp = convert_A_simple(p)
-        messagebox.showinfo("OK", f"Zapisano:\n{outp}")
+        outp, profile = convert_A_simple(p)
+        messagebox.showinfo("OK", f"Zapisano:\n{outp}\n\nProfil nagłówka: {profile}")
     except Exception as e:
         messagebox.showerror("Błąd", str(e))
 
@@ -644,8 +833,8 @@ def run_B1():
     if not tpl:
         return
     try:
-        outp = convert_B_printer_1to1_only_first_table_with_meta(p, tpl)
-        messagebox.showinfo("OK", f"Zapisano:\n{outp}")
+        outp, profile = convert_B_printer_1to1_only_first_table_with_meta(p, tpl)
+        messagebox.showinfo("OK", f"Zapisano:\n{outp}\n\nProfil nagłówka: {profile}")
     except Exception as e:
         messagebox.showerror("Błąd", str(e))
 
@@ -661,15 +850,37 @@ def run_B2():
         )
         return
     try:
-        outp = convert_B_printer_1to1_only_first_table_with_meta(p, tpl)
-        messagebox.showinfo("OK", f"Zapisano:\n{outp}")
+        outp, profile = convert_B_printer_1to1_only_first_table_with_meta(p, tpl)
+        messagebox.showinfo("OK", f"Zapisano:\n{outp}\n\nProfil nagłówka: {profile}")
+    except Exception as e:
+        messagebox.showerror("Błąd", str(e))
+
+def natural_path_key(path: str):
+    # "lot_2" przed "lot_10"
+    name = os.path.basename(path).lower()
+    return [int(x) if x.isdigit() else x for x in re.split(r"(\d+)", name)]
+
+def run_B3():
+    paths = filedialog.askopenfilenames(
+        title="Wskaż pliki lista_konk_oddz*.txt (kolejność wydruku = wg nazw plików)",
+        filetypes=[("Pliki tekstowe", "*.txt"), ("Wszystkie pliki", "*.*")]
+    )
+    if not paths:
+        return
+    tpl = pick_template()
+    if not tpl:
+        return
+    try:
+        outp, profiles = convert_B_batch_print(sorted(paths, key=natural_path_key), tpl)
+        used = ", ".join(dict.fromkeys(profiles))
+        messagebox.showinfo("OK", f"Zapisano {len(profiles)} lotów:\n{outp}\n\nProfil nagłówka: {used}")
     except Exception as e:
         messagebox.showerror("Błąd", str(e))
 
 def main():
     root = tk.Tk()
     root.title("Konwerter lista_konk → LKON (1:1 LKON_M02)")
-    root.geometry("760x320")
+    root.geometry("760x380")
     root.resizable(False, False)
 
     tk.Label(
@@ -686,6 +897,7 @@ def main():
     tk.Button(root, text="A) Prosty *_LKON.txt (same rekordy 1:1 wg LKON_TEMPLATE.TXT)", width=92, height=2, command=run_A).pack(pady=6)
     tk.Button(root, text="B1) Drukarkowy *_LKON_DRUK.txt (wybierz LKON_M02 jako szablon)", width=92, height=2, command=run_B1).pack(pady=6)
     tk.Button(root, text="B2) Drukarkowy (LKON_TEMPLATE.TXT obok EXE)", width=92, height=2, command=run_B2).pack(pady=6)
+    tk.Button(root, text="B3) Zbiorczy wydruk wielu lotów (jeden *_LKON_DRUK_ZBIORCZY.txt)", width=92, height=2, command=run_B3).pack(pady=6)
 
     root.mainloop()
 